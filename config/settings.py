@@ -24,16 +24,38 @@ ROUTER_LLM_MODEL = os.getenv("ROUTER_LLM_MODEL", "qwen-turbo")
 PLANNER_LLM_MODEL = os.getenv("PLANNER_LLM_MODEL", "qwen-max")
 EXECUTOR_LLM_MODEL = os.getenv("EXECUTOR_LLM_MODEL", "qwen-turbo")
 
+# --- 执行器级联配置 ---
+# 开启后每个执行步骤先用快模型执行，校验失败时再升级到强模型
+# 未单独配置时，快模型沿用执行器模型，强模型沿用规划器模型，保证提供商和模型名称匹配
+EXECUTOR_CASCADE_ENABLED = os.getenv("EXECUTOR_CASCADE_ENABLED", "false").lower() == "true"
+EXECUTOR_FAST_LLM_PROVIDER = os.getenv("EXECUTOR_FAST_LLM_PROVIDER", EXECUTOR_LLM_PROVIDER).lower()
+EXECUTOR_FAST_LLM_MODEL = os.getenv("EXECUTOR_FAST_LLM_MODEL", EXECUTOR_LLM_MODEL)
+EXECUTOR_STRONG_LLM_PROVIDER = os.getenv("EXECUTOR_STRONG_LLM_PROVIDER", PLANNER_LLM_PROVIDER).lower()
+EXECUTOR_STRONG_LLM_MODEL = os.getenv("EXECUTOR_STRONG_LLM_MODEL", PLANNER_LLM_MODEL)
+EXECUTOR_FAST_MAX_ITERATIONS = int(os.getenv("EXECUTOR_FAST_MAX_ITERATIONS", "5"))
+
 # --- LLM 参数 ---
 PLANNER_LLM_TEMPERATURE = 0.0
 EXECUTOR_LLM_TEMPERATURE = 0.0
 ROUTER_LLM_TEMPERATURE = 0.0
 DIRECT_ANSWER_LLM_TEMPERATURE = 0.7 # 直接回答时可以更有创意一点
+SEARCH_ANSWER_LLM_TEMPERATURE = 0.0 # 基于搜索结果回答时需要严格忠于来源
+
+# --- 快速搜索回答配置 ---
+SEARCH_ANSWER_MAX_RESULTS = 5 # 单次搜索返回的结果数
+SEARCH_ANSWER_MAX_CHARS_PER_RESULT = 800 # 每条结果截断后放入提示的最大字符数
 
 # --- Browser 配置 ---
 # True 为无头模式（后台运行），False 为有头模式（会弹出浏览器窗口）
 BROWSER_HEADLESS = False 
 
+# --- 代码内核配置 ---
+# "e2b": 在 E2B 沙箱中使用常驻的 Jupyter 内核 (需要安装 e2b-code-interpreter)
+# "local": 本地常驻 Python 子进程，没有隔离，仅用于开发调试
+CODE_KERNEL_BACKEND = os.getenv("CODE_KERNEL_BACKEND", "e2b").lower()
+CODE_KERNEL_TIMEOUT = int(os.getenv("CODE_KERNEL_TIMEOUT", "60")) # 单次代码执行的超时时间 (秒)
+CODE_KERNEL_MAX_OUTPUT_CHARS = int(os.getenv("CODE_KERNEL_MAX_OUTPUT_CHARS", "4000")) # 每部分输出的最大字符数
+
 # --- Agent 配置 ---
 PLANNER_PROMPT = (
     "请先理解任务内容，并制定解决该任务的计划。"
@@ -1,81 +1,146 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_community.chat_models import ChatTongyi
 from langchain_experimental.plan_and_execute import PlanAndExecute, load_agent_executor, load_chat_planner
-from langchain_community.agent_toolkits.playwright.toolkit import PlayWrightBrowserToolkit
 from langchain_tavily import TavilySearch
 from typing import Optional, Callable
 from uuid import UUID
 from langchain_core.callbacks import BaseCallbackHandler
 from typing import Any, Dict, List, Optional, Callable, Union
 from langchain_core.outputs import LLMResult, ChatGeneration
+import logging
+import re
 from config import settings
 from src.tools.custom_tools import get_current_date
 from src.tools.sanbox import SandboxToolManager
+from src.tools.kernel import KernelToolManager
+from src.tools.provisioning import ResourceProvisioner, get_lazy_browser_tools
 from src.llm_factory import get_llm
+from src.cascade_executor import CascadeExecutor
+from src.tool_selecting_executor import ToolSelectingExecutor
+from src.metrics import StreamTimer, get_output_tokens
+from src.streaming import FinalAnswerExtractor
+
+logger = logging.getLogger(__name__)
 
 class StreamingCallbackHandler(BaseCallbackHandler):
     """一个处理流式输出的回调处理器"""
-    def __init__(self, send_event: Callable):
-        print("__init__")
+    def __init__(self, send_event: Optional[Callable] = None):
         self.send_event = send_event
+        self.root_run_id: Optional[UUID] = None
         self.planner_run_id: Optional[UUID] = None
         self.planner_identified = False
         self.is_planner_finished = False
+        self.plan_steps: List[str] = []
+        self.current_step: Optional[str] = None
+        self.has_streamed_chunks = False
+        self.timers: Dict[UUID, StreamTimer] = {}
+        self.extractors: Dict[UUID, FinalAnswerExtractor] = {}
+
+    async def _send(self, event_name: str, data: Any) -> None:
+        # 同步模式下没有 send_event，回调只用于记录延迟指标
+        if self.send_event:
+            await self.send_event(event_name, data)
+
+    @property
+    def is_final_step(self) -> bool:
+        """执行器是否正在执行计划的最后一步，最后一步的回答就是任务的最终结果"""
+        return bool(self.plan_steps) and self.current_step == self.plan_steps[-1].strip()
 
     async def on_chat_model_start(
-        self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any
+        self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any
     ) -> None:
-        """模型开始生成时"""
-        # await self.send_event("log", "思考中...")
-        pass
+        """模型开始生成时，开始计时"""
+        metadata = kwargs.get("metadata") or {}
+        provider = metadata.get("ls_provider") or serialized.get("id", ["unknown"])[-1]
+        model = metadata.get("ls_model_name") or serialized.get("kwargs", {}).get("model_name", "unknown")
+        self.timers[run_id] = StreamTimer(provider, model)
 
-    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+    async def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
         """流式获取 LLM 的 token"""
-        # 对于非流式模型，这个可能不会被频繁触发，但对于流式模型很有用
-        await self.send_event("log", f"LLM Token: {token}")
+        timer = self.timers.get(run_id)
+        if timer:
+            timer.on_token()
+
+        # 只把最后一步中 "Final Answer" 的正文作为 chunk 推给前端
+        if self.is_final_step:
+            extractor = self.extractors.setdefault(run_id, FinalAnswerExtractor())
+            text = extractor.feed(token)
+            if text:
+                self.has_streamed_chunks = True
+                await self._send("chunk", text)
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        """模型生成结束时，记录首 token 延迟和生成速度"""
+        self.extractors.pop(run_id, None)
+        timer = self.timers.pop(run_id, None)
+        if timer:
+            # 优先使用提供商返回的真实输出 token 数，chunk 数只作为参考
+            stats = timer.finish(output_tokens=get_output_tokens(response))
+            if stats:
+                logger.info(
+                    f"LLM {timer.provider}/{timer.model}: TTFT {stats['ttft']:.2f}s, "
+                    f"{stats['output_tokens'] or '?'} tokens / {stats['chunks']} chunks in {stats['duration']:.2f}s"
+                )
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self.extractors.pop(run_id, None)
+        self.timers.pop(run_id, None)
 
     async def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs: Any) -> None:
         """工具开始执行时"""
         tool_name = serialized.get("name")
         # 将日志信息格式化得更易读
-        await self.send_event("log", f"⏳ 正在调用工具: `{tool_name}` | 输入: `{input_str}`")
+        await self._send("log", f"⏳ 正在调用工具: `{tool_name}` | 输入: `{input_str}`")
 
     async def on_tool_end(self, output: str, **kwargs: Any) -> None:
         """工具执行结束时"""
         if output is not None:
-            await self.send_event("log", f"✅ 工具返回: `{output[:200]}...`")
+            await self._send("log", f"✅ 工具返回: `{output[:200]}...`")
 
     async def on_chain_start(
         self, serialized: Dict[str, Any], inputs: Dict[str, Any], *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any
     ) -> None:
-        print("on_chain_start", self.planner_run_id, serialized, inputs, parent_run_id, run_id, kwargs)
-        if parent_run_id and not self.planner_identified:
+        if parent_run_id is None:
+            if self.root_run_id is None:
+                self.root_run_id = run_id
+
+        elif parent_run_id == self.root_run_id and not self.planner_identified:
              # 假设第一个子链是 planner
              self.planner_run_id = run_id
              self.planner_identified = True 
-             await self.send_event("log", "📝 规划器已启动，正在制定计划...")
+             await self._send("log", "📝 规划器已启动，正在制定计划...")
 
-        elif parent_run_id and self.is_planner_finished:
-            # await self.send_event("log", "🚀 **执行阶段**: 执行器已启动...")
-            pass
+        elif parent_run_id == self.root_run_id and self.is_planner_finished:
+            # planner 之后的直接子链是执行器，同一步骤可能因模型升级被执行多次，
+            # 所以按输入中的 current_step 判断当前是哪一步
+            current_step = inputs.get("current_step")
+            current_step = getattr(current_step, "value", str(current_step)).strip()
+            if current_step == self.current_step and self.has_streamed_chunks:
+                # 同一步骤被重新执行 (例如快模型的回答未通过校验而升级)，
+                # 通知前端清空已推送的、被丢弃的回答
+                await self._send("chunk_reset", "")
+            self.has_streamed_chunks = False
+            self.current_step = current_step
 
     async def on_chain_end(
         self, outputs: Dict[str, Any], *, run_id: UUID, **kwargs: Any
     ) -> Any:
-        print("on_chain_end", outputs, run_id, kwargs)
         """在链结束时触发"""
         # --- 关键逻辑：检查是否是 Planner Chain 结束 ---
         if run_id == self.planner_run_id and not self.is_planner_finished:
-            await self.send_event("log", "✅ **规划阶段**: 计划已生成。")
+            await self._send("log", "✅ **规划阶段**: 计划已生成。")
             plan_text = outputs.get('text', '无法提取计划文本。')
-            await self.send_event("plan", plan_text)
+            await self._send("plan", plan_text)
+            # 与 PlanningOutputParser 相同的拆分方式，用于判断哪一步是最后一步
+            self.plan_steps = re.split(r"\n\s*\d+\. ", plan_text)[1:]
             
             # 更新状态：标记Planner已结束
             self.is_planner_finished = True
 
-async def create_agent(browser, sandbox, stream_callback: Optional[Callable] = None):
+async def create_agent(provisioner: ResourceProvisioner, stream_callback: Optional[Callable] = None):
     """
-    根据传入的浏览器和沙箱实例，创建并返回一个Plan-and-Execute Agent。
+    创建并返回一个Plan-and-Execute Agent。
+    浏览器和沙箱由 provisioner 在工具第一次被调用时才启动。
     """
 
     # 规划器
@@ -89,27 +154,60 @@ async def create_agent(browser, sandbox, stream_callback: Optional[Callable] = N
         system_prompt=settings.PLANNER_PROMPT,
     )
 
+    # 工具集：基础工具始终可用，浏览器和沙箱工具按步骤需要加入
+    base_tools = [get_current_date, TavilySearch(max_results=3)]
+    tool_groups = {
+        "browser": get_lazy_browser_tools(provisioner),
+        # E2B沙箱工具，以及在多个步骤之间保留状态的代码内核
+        "sandbox": (
+            SandboxToolManager(provisioner.get_sandbox).get_all_tools()
+            + KernelToolManager(provisioner.get_kernel).get_all_tools()
+        ),
+    }
+
     # 执行器
-    executor_llm = get_llm(
-        provider=settings.EXECUTOR_LLM_PROVIDER,
-        model_name=settings.EXECUTOR_LLM_MODEL,
-        temperature=settings.EXECUTOR_LLM_TEMPERATURE
-    )
+    # 开启 streaming，以便回调处理器逐 token 推送最终回答并记录首 token 延迟
+    if settings.EXECUTOR_CASCADE_ENABLED:
+        fast_llm = get_llm(
+            provider=settings.EXECUTOR_FAST_LLM_PROVIDER,
+            model_name=settings.EXECUTOR_FAST_LLM_MODEL,
+            temperature=settings.EXECUTOR_LLM_TEMPERATURE,
+            streaming=True
+        )
+        strong_llm = get_llm(
+            provider=settings.EXECUTOR_STRONG_LLM_PROVIDER,
+            model_name=settings.EXECUTOR_STRONG_LLM_MODEL,
+            temperature=settings.EXECUTOR_LLM_TEMPERATURE,
+            streaming=True
+        )
+        def build_executor(tools):
+            return CascadeExecutor.from_llms(
+                fast_llm,
+                strong_llm,
+                tools,
+                fast_max_iterations=settings.EXECUTOR_FAST_MAX_ITERATIONS,
+                verbose=True,
+            )
+    else:
+        executor_llm = get_llm(
+            provider=settings.EXECUTOR_LLM_PROVIDER,
+            model_name=settings.EXECUTOR_LLM_MODEL,
+            temperature=settings.EXECUTOR_LLM_TEMPERATURE,
+            streaming=True
+        )
+        def build_executor(tools):
+            # verbose=True 会在执行时打印详细日志，方便调试
+            return load_agent_executor(
+                executor_llm, 
+                tools, 
+                verbose=True,
+            )
 
-    # 工具集
-    tools = [get_current_date]
-    tools.extend(PlayWrightBrowserToolkit.from_browser(async_browser=browser).get_tools())
-    tools.append(TavilySearch(max_results=3)) 
-
-    # E2B沙箱工具
-    sandbox_tool_manager = SandboxToolManager(sandbox)
-    tools.extend(sandbox_tool_manager.get_all_tools())
-    
-    # verbose=True 会在执行时打印详细日志，方便调试
-    executor = load_agent_executor(
-        executor_llm, 
-        tools, 
-        verbose=True,
+    # 每个步骤只把需要的工具放进执行器提示
+    executor = ToolSelectingExecutor(
+        base_tools=base_tools,
+        tool_groups=tool_groups,
+        executor_factory=build_executor,
     )
 
     return PlanAndExecute(
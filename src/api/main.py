@@ -32,6 +32,7 @@ except FileNotFoundError:
 
 from src.api.models import TaskRequest, TaskCreationResponse, TaskStatusResponse
 from src.task_runner import run_agent_task
+from src.metrics import latency_recorder, cascade_stats
 
 logger = logging.getLogger(__name__)
 
@@ -96,7 +97,8 @@ async def execute_task(request: TaskRequest, fastapi_req: Request):
                         logger.warning("Client disconnected, stopping stream.")
                         break
 
-                    if not isinstance(data, str):
+                    # chunk 可能包含换行或首尾空格，统一 JSON 编码以便前端原样还原
+                    if event_name in ("chunk", "chunk_reset") or not isinstance(data, str):
                         data = json.dumps(data, ensure_ascii=False)
                     
                     yield {"event": event_name, "data": data}
@@ -127,3 +129,16 @@ async def execute_task(request: TaskRequest, fastapi_req: Request):
         asyncio.create_task(run_in_background())
 
         return EventSourceResponse(stream_generator())
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    返回运行指标：
+    - llm_latency: 各 LLM 提供商/模型的平均首 token 延迟 (TTFT)、chunks/s，
+      以及提供商返回用量信息时的真实 tokens/s
+    - executor_cascade: 按步骤类型统计的执行器级联升级情况
+    """
+    return {
+        "llm_latency": latency_recorder.snapshot(),
+        "executor_cascade": cascade_stats.snapshot(),
+    }
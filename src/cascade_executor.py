@@ -0,0 +1,194 @@
+import logging
+from typing import Any, List, Optional
+from langchain.agents import AgentExecutor
+from langchain_core.callbacks import BaseCallbackHandler, BaseCallbackManager, Callbacks
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models import BaseChatModel
+from langchain_core.tools import BaseTool, ToolException
+from langchain_experimental.plan_and_execute import load_agent_executor
+from langchain_experimental.plan_and_execute.executors.base import BaseExecutor
+from langchain_experimental.plan_and_execute.schema import ListStepContainer, Step, StepResponse
+
+from src.metrics import cascade_stats
+
+logger = logging.getLogger(__name__)
+
+# AgentExecutor 达到 max_iterations 时返回的固定文本
+ITERATION_LIMIT_OUTPUT = "Agent stopped due to iteration limit or time limit."
+
+# 会改变外部状态的工具：内核变量、沙箱文件、浏览器页面。重复执行会让副作用叠加
+STATEFUL_TOOL_NAMES = {
+    "run_python_code",
+    "reset_python_kernel",
+    "run_shell_command",
+    "write_file_in_sandbox",
+    "click_element",
+    "navigate_browser",
+    "previous_webpage",
+}
+
+# 重试时每个工具返回值保留的最大字符数
+_RETRY_OBSERVATION_CHARS = 500
+
+
+class ToolRecorder(BaseCallbackHandler):
+    """记录一次执行中调用过的工具及其输入输出，用于给步骤分类和构造重试上下文"""
+    def __init__(self):
+        self.tools: List[str] = []
+        self.calls: List[List[Any]] = [] # [工具名, 输入, 输出]
+
+    def on_tool_start(self, serialized: dict, input_str: str, **kwargs: Any) -> None:
+        name = serialized.get("name", "unknown")
+        self.tools.append(name)
+        self.calls.append([name, input_str, None])
+
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        if self.calls:
+            self.calls[-1][2] = str(output)[:_RETRY_OBSERVATION_CHARS]
+
+    def on_tool_error(self, error: BaseException, **kwargs: Any) -> None:
+        if self.calls:
+            self.calls[-1][2] = f"Error: {error}"
+
+    @property
+    def called_stateful_tool(self) -> bool:
+        return any(name in STATEFUL_TOOL_NAMES for name in self.tools)
+
+
+def build_retry_inputs(inputs: dict, recorder: ToolRecorder) -> dict:
+    """
+    为重新执行一个步骤准备输入。
+    上一次尝试调用过有状态工具时，把已执行的工具调用和结果作为一个"未完成的尝试"追加到 previous_steps，
+    让重试在现有状态上继续，而不是把这些操作再做一遍；否则原样返回输入，从头重试。
+    """
+    if not recorder.called_stateful_tool:
+        return inputs
+
+    current_step = inputs.get("current_step")
+    step_value = getattr(current_step, "value", str(current_step))
+    executed = "\n".join(f"- {name}({tool_input}) -> {output}" for name, tool_input, output in recorder.calls)
+    attempt = (
+        Step(value=f"[未完成的尝试] {step_value}"),
+        StepResponse(response=(
+            "以下工具调用已经执行过，它们产生的变量、文件和页面状态仍然存在。"
+            "请在此基础上继续完成当前步骤，不要重复执行这些操作：\n" + executed
+        )),
+    )
+    previous = list(getattr(inputs.get("previous_steps"), "steps", []))
+    return {**inputs, "previous_steps": ListStepContainer(steps=previous + [attempt])}
+
+
+def with_callback_handler(callbacks: Callbacks, handler: BaseCallbackHandler) -> Callbacks:
+    """在不修改原回调的前提下追加一个处理器"""
+    if isinstance(callbacks, BaseCallbackManager):
+        callbacks = callbacks.copy()
+        callbacks.add_handler(handler, inherit=True)
+        return callbacks
+    return list(callbacks or []) + [handler]
+
+
+def validate_step_result(result: dict) -> Optional[str]:
+    """
+    检查快模型的执行结果是否可信。
+    返回需要升级的原因，结果可用时返回 None。
+    """
+    output = result.get("output")
+    if not output or not str(output).strip():
+        return "empty_answer"
+    if str(output).strip() == ITERATION_LIMIT_OUTPUT:
+        return "iteration_limit"
+
+    # 只把连续两次完全相同的动作视为陷入循环；
+    # 间隔重复 (例如每次 navigate 之后都 extract_text) 是正常的操作序列
+    previous = None
+    for action, _ in result.get("intermediate_steps", []):
+        if action.tool == "_Exception":
+            return "parsing_error"
+        key = (action.tool, str(action.tool_input))
+        if key == previous:
+            return "repeated_action"
+        previous = key
+    return None
+
+
+def classify_error(error: Exception) -> str:
+    """把快模型执行时抛出的异常归类为升级原因"""
+    if isinstance(error, ToolException):
+        return "tool_error"
+    # AgentExecutor 会把 OutputParserException 包装成 ValueError 重新抛出
+    if isinstance(error, OutputParserException) or isinstance(error.__cause__, OutputParserException):
+        return "parsing_error"
+    return "error"
+
+
+class CascadeExecutor(BaseExecutor):
+    """
+    级联执行器：每个步骤先交给快速、便宜的模型执行，
+    只有当结果校验失败 (解析错误、工具报错、空回答、连续重复动作等) 时才升级到更强的模型重新执行。
+
+    升级时快模型已经执行过的工具调用不会被撤销，因此：
+    - 快模型只调用了无副作用的工具 (搜索、读取等)，强模型从头重新执行该步骤；
+    - 快模型调用过有状态工具 (STATEFUL_TOOL_NAMES)，已执行的调用及结果会作为上下文传给强模型，
+      要求它在现有状态上继续，避免 `df = df.dropna()`、写文件等操作被重复执行。
+    """
+    fast_chain: AgentExecutor
+    strong_chain: AgentExecutor
+
+    @classmethod
+    def from_llms(
+        cls,
+        fast_llm: BaseChatModel,
+        strong_llm: BaseChatModel,
+        tools: List[BaseTool],
+        fast_max_iterations: int = 5,
+        verbose: bool = False,
+    ) -> "CascadeExecutor":
+        fast_chain = load_agent_executor(fast_llm, tools, verbose=verbose).chain
+        # 需要中间步骤来检查重复动作；快模型的迭代次数更少，陷入循环时尽早升级
+        fast_chain.return_intermediate_steps = True
+        fast_chain.max_iterations = fast_max_iterations
+        strong_chain = load_agent_executor(strong_llm, tools, verbose=verbose).chain
+        return cls(fast_chain=fast_chain, strong_chain=strong_chain)
+
+    @staticmethod
+    def _check_fast_result(
+        recorder: ToolRecorder, result: Optional[dict], error: Optional[Exception]
+    ) -> Optional[str]:
+        """校验快模型的执行结果并记录统计，返回升级原因；结果可用时返回 None"""
+        if error is not None:
+            logger.warning(f"Fast executor failed: {error}")
+            reason = classify_error(error)
+        else:
+            reason = validate_step_result(result)
+
+        step_type = "+".join(sorted(set(recorder.tools))) or "no_tool"
+        cascade_stats.record(step_type, escalated=reason is not None, reason=reason)
+        if reason is not None:
+            logger.info(f"Escalating step '{step_type}' to strong executor, reason: {reason}")
+        return reason
+
+    def step(self, inputs: dict, callbacks: Callbacks = None, **kwargs: Any) -> StepResponse:
+        recorder = ToolRecorder()
+        result, error = None, None
+        try:
+            result = self.fast_chain.invoke(inputs, config={"callbacks": with_callback_handler(callbacks, recorder)})
+        except Exception as e:
+            error = e
+
+        if self._check_fast_result(recorder, result, error) is None:
+            return StepResponse(response=result["output"])
+        response = self.strong_chain.run(**build_retry_inputs(inputs, recorder), callbacks=callbacks)
+        return StepResponse(response=response)
+
+    async def astep(self, inputs: dict, callbacks: Callbacks = None, **kwargs: Any) -> StepResponse:
+        recorder = ToolRecorder()
+        result, error = None, None
+        try:
+            result = await self.fast_chain.ainvoke(inputs, config={"callbacks": with_callback_handler(callbacks, recorder)})
+        except Exception as e:
+            error = e
+
+        if self._check_fast_result(recorder, result, error) is None:
+            return StepResponse(response=result["output"])
+        response = await self.strong_chain.arun(**build_retry_inputs(inputs, recorder), callbacks=callbacks)
+        return StepResponse(response=response)
@@ -5,13 +5,15 @@ from langchain_core.language_models import BaseChatModel
 
 from config import settings
 
-def get_llm(provider: str, model_name: str, temperature: float, **kwargs) -> BaseChatModel:
+def get_llm(provider: str, model_name: str, temperature: float, streaming: bool = False, **kwargs) -> BaseChatModel:
     """
     一个工厂函数，根据提供的参数创建并返回一个LLM实例。
     
     :param provider: LLM提供商 (e.g., "google", "openai", "tongyi")
     :param model_name: 具体的模型名称
     :param temperature: 模型温度
+    :param streaming: 是否在 invoke 时也按 token 流式生成 (会触发 on_llm_new_token 回调)。
+                      Google 模型不支持该参数，只在 astream 时流式输出
     :param kwargs: 其他传递给模型构造函数的参数 (如 callbacks)
     :return: 一个实现了 BaseChatModel 的LLM实例
     """
@@ -29,6 +31,8 @@ def get_llm(provider: str, model_name: str, temperature: float, **kwargs) -> Bas
             model=model_name,
             temperature=temperature,
             openai_api_key=settings.OPENAI_API_KEY,
+            streaming=streaming,
+            stream_usage=True, # 流式输出时也返回 token 用量，用于统计 tokens/s
             **kwargs
         )
     elif provider == "tongyi":
@@ -36,6 +40,7 @@ def get_llm(provider: str, model_name: str, temperature: float, **kwargs) -> Bas
             model_name=model_name,
             temperature=temperature,
             dashscope_api_key=settings.DASHSCOPE_API_KEY,
+            streaming=streaming,
             **kwargs
         )
     else:
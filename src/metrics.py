@@ -0,0 +1,173 @@
+import time
+import threading
+from typing import Any, Dict, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class LatencyRecorder:
+    """
+    按 LLM 提供商/模型汇总流式输出的延迟指标。
+    记录首 token 延迟 (TTFT)、chunks/s，以及提供商返回了用量信息时的真实 tokens/s。
+    各提供商每个 chunk 包含的 token 数差别很大，chunks/s 不能跨提供商比较。
+    数据仅保存在进程内存中。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, dict] = {}
+
+    def record(
+        self, provider: str, model: str, ttft: float, chunks: int, duration: float,
+        output_tokens: Optional[int] = None,
+    ):
+        key = f"{provider}/{model}"
+        # 生成速度只统计首 token 之后的时间，避免把排队/预填充时间算进去
+        generation_seconds = max(duration - ttft, 0.0)
+        with self._lock:
+            stats = self._stats.setdefault(key, {
+                "provider": provider,
+                "model": model,
+                "count": 0,
+                "ttft_total": 0.0,
+                "ttft_last": 0.0,
+                "chunks_total": 0,
+                "generation_seconds_total": 0.0,
+                "tokens_total": 0,
+                "token_seconds_total": 0.0,
+            })
+            stats["count"] += 1
+            stats["ttft_total"] += ttft
+            stats["ttft_last"] = ttft
+            stats["chunks_total"] += chunks
+            stats["generation_seconds_total"] += generation_seconds
+            if output_tokens:
+                stats["tokens_total"] += output_tokens
+                stats["token_seconds_total"] += generation_seconds
+
+    def snapshot(self) -> Dict[str, dict]:
+        """返回每个提供商/模型的平均 TTFT、chunks/s 和 tokens/s (没有用量信息时为 None)"""
+        with self._lock:
+            result = {}
+            for key, stats in self._stats.items():
+                generation_seconds = stats["generation_seconds_total"]
+                token_seconds = stats["token_seconds_total"]
+                result[key] = {
+                    "provider": stats["provider"],
+                    "model": stats["model"],
+                    "count": stats["count"],
+                    "avg_ttft_seconds": round(stats["ttft_total"] / stats["count"], 3),
+                    "last_ttft_seconds": round(stats["ttft_last"], 3),
+                    "chunks_per_second": round(stats["chunks_total"] / generation_seconds, 2) if generation_seconds > 0 else None,
+                    "tokens_per_second": round(stats["tokens_total"] / token_seconds, 2) if token_seconds > 0 else None,
+                }
+            return result
+
+
+def get_output_tokens(usage_source) -> Optional[int]:
+    """
+    从消息的 usage_metadata 或 LLMResult 的 llm_output["token_usage"] 中读取输出 token 数。
+    读取不到时返回 None。
+    """
+    usage_metadata = getattr(usage_source, "usage_metadata", None)
+    if usage_metadata and usage_metadata.get("output_tokens"):
+        return usage_metadata["output_tokens"]
+
+    # LLMResult：先看每个生成结果的消息，再看 llm_output
+    for generations in getattr(usage_source, "generations", None) or []:
+        for generation in generations:
+            tokens = get_output_tokens(getattr(generation, "message", None))
+            if tokens:
+                return tokens
+    token_usage = (getattr(usage_source, "llm_output", None) or {}).get("token_usage") or {}
+    return token_usage.get("completion_tokens") or token_usage.get("output_tokens")
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """在 astream 调用中收集模型返回的输出 token 数，供 StreamTimer.finish() 使用"""
+    def __init__(self):
+        self.output_tokens: Optional[int] = None
+
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        self.output_tokens = get_output_tokens(response)
+
+
+class StreamTimer:
+    """
+    一次流式调用的计时器。
+    每收到一个 chunk 调用一次 on_token()，结束时调用 finish() 写入 LatencyRecorder。
+    """
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self.start_time = time.perf_counter()
+        self.first_token_time: Optional[float] = None
+        self.chunks = 0
+
+    @classmethod
+    def for_llm(cls, llm) -> "StreamTimer":
+        """
+        用 LangChain 的 ls_provider/ls_model_name 标识模型，
+        与回调处理器从 metadata 中读取的标识一致，同一模型的指标不会被拆成两条。
+        """
+        params = llm._get_ls_params()
+        return cls(params.get("ls_provider", "unknown"), params.get("ls_model_name", "unknown"))
+
+    def on_token(self):
+        if self.first_token_time is None:
+            self.first_token_time = time.perf_counter()
+        self.chunks += 1
+
+    @property
+    def ttft(self) -> Optional[float]:
+        if self.first_token_time is None:
+            return None
+        return self.first_token_time - self.start_time
+
+    def finish(
+        self, output_tokens: Optional[int] = None, recorder: Optional[LatencyRecorder] = None
+    ) -> Optional[dict]:
+        """
+        结束计时并记录指标；没有收到任何 chunk 时不记录。
+        output_tokens 为提供商返回的真实输出 token 数，没有时只统计 chunks/s。
+        """
+        if self.first_token_time is None:
+            return None
+        duration = time.perf_counter() - self.start_time
+        (recorder or latency_recorder).record(
+            self.provider, self.model, self.ttft, self.chunks, duration, output_tokens=output_tokens
+        )
+        return {"ttft": self.ttft, "chunks": self.chunks, "output_tokens": output_tokens, "duration": duration}
+
+
+class CascadeStats:
+    """
+    按步骤类型统计执行器级联 (先快模型、失败再升级强模型) 的结果。
+    步骤类型由快模型执行该步时调用过的工具决定，例如 "tavily_search"、"no_tool"。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, dict] = {}
+
+    def record(self, step_type: str, escalated: bool, reason: Optional[str] = None):
+        with self._lock:
+            stats = self._stats.setdefault(step_type, {"steps": 0, "escalated": 0, "reasons": {}})
+            stats["steps"] += 1
+            if escalated:
+                stats["escalated"] += 1
+                stats["reasons"][reason] = stats["reasons"].get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                step_type: {
+                    "steps": stats["steps"],
+                    "escalated": stats["escalated"],
+                    "escalation_rate": round(stats["escalated"] / stats["steps"], 3),
+                    "reasons": dict(stats["reasons"]),
+                }
+                for step_type, stats in self._stats.items()
+            }
+
+
+# 全局单例，供 task_runner、回调处理器和 API 共用
+latency_recorder = LatencyRecorder()
+cascade_stats = CascadeStats()
@@ -15,15 +15,17 @@ llm = get_llm(
 router_prompt = ChatPromptTemplate.from_messages(
     [
        ("system", 
-         "你是一个任务分类机器人。你的唯一工作是分析用户查询，并从以下两个选项中选择一个最合适的来描述它："
-         "'direct_answer' 或 'plan_and_execute'。\n"
-         "不要添加任何解释、标点符号或多余的文字，只返回这两个词中的一个。\n\n"
-         "判断的核心标准是：**该任务是否需要访问外部、实时的信息或执行具体操作。**\n\n"
+         "你是一个任务分类机器人。你的唯一工作是分析用户查询，并从以下三个选项中选择一个最合适的来描述它："
+         "'direct_answer'、'search_answer' 或 'plan_and_execute'。\n"
+         "不要添加任何解释、标点符号或多余的文字，只返回这三个词中的一个。\n\n"
+         "判断的核心标准是：**该任务是否需要访问外部、实时的信息或执行具体操作，以及一次搜索能否解决。**\n\n"
          "--- 规则 ---\n"
          "1.  如果查询是**纯粹的对话、常识性问答、文本总结、内容创作或数学计算**，这些你仅凭自身知识就能完成的任务，请返回: `direct_answer`\n"
          "    - 示例: '你好', '什么是人工智能?', '总结一下这段文字', '写一首诗', '2+2等于几?'\n\n"
-         "2.  如果查询需要**获取当前、实时或非常具体的信息（如天气、新闻、股价、特定网站内容）**，或者需要**执行代码、操作文件**，这些必须使用工具才能完成的任务，请返回: `plan_and_execute`\n"
-         "    - 示例: '今天天气怎么样?', '苹果公司最新的股价是多少?', '访问 xxx.com', '运行这段代码'"),
+         "2.  如果查询只需要**获取当前、实时的信息（如天气、新闻、股价、赛事结果）**，一次网络搜索就能找到答案，请返回: `search_answer`\n"
+         "    - 示例: '今天天气怎么样?', '苹果公司最新的股价是多少?', '今天有什么科技新闻?'\n\n"
+         "3.  如果查询需要**访问或操作特定网站、执行代码、操作文件，或需要多个步骤才能完成**，请返回: `plan_and_execute`\n"
+         "    - 示例: '访问 xxx.com 并总结首页内容', '运行这段代码', '对比三家公司近五年的营收并画图'"),
         ("human", "用户查询: ```{input}```"),
     ]
 )
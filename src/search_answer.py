@@ -0,0 +1,116 @@
+import logging
+from datetime import datetime
+from typing import Any, Callable, Optional
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from langchain_tavily import TavilySearch
+
+from config import settings
+from src.llm_factory import get_llm
+from src.metrics import StreamTimer, TokenUsageHandler
+
+logger = logging.getLogger(__name__)
+
+# 搜索结果不足以回答时，模型只输出这个标记，调用方据此回退到 plan_and_execute
+NOT_GROUNDED = "NOT_GROUNDED"
+
+search_answer_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system",
+         "你是一个乐于助人的AI助手。今天是 {today}。\n"
+         "请**只根据**下面的搜索结果回答用户的问题，回答要直接、简洁，并在适当位置注明来源链接。\n"
+         f"如果搜索结果不足以准确回答问题，不要猜测，只输出 `{NOT_GROUNDED}`，不要输出任何其他内容。\n\n"
+         "--- 搜索结果 ---\n{context}"),
+        ("human", "{input}"),
+    ]
+)
+
+
+def format_search_results(response: Any, max_chars: int = settings.SEARCH_ANSWER_MAX_CHARS_PER_RESULT) -> str:
+    """把 Tavily 的返回结果压缩成给 LLM 的上下文，每条结果截断到 max_chars 个字符"""
+    if not isinstance(response, dict):
+        return ""
+    sections = []
+    for i, item in enumerate(response.get("results") or [], start=1):
+        content = (item.get("content") or "").strip()
+        if not content:
+            continue
+        sections.append(f"[{i}] {item.get('title', '')}\n来源: {item.get('url', '')}\n{content[:max_chars]}")
+    return "\n\n".join(sections)
+
+
+async def run_search_answer(task: str, stream_callback: Optional[Callable] = None) -> Optional[str]:
+    """
+    快速搜索回答：一次 Tavily 搜索 + 一次 LLM 调用，不启动规划器、浏览器和沙箱。
+    成功则返回答案；搜索失败或答案没有依据时返回 None，由调用方回退到完整的 plan_and_execute。
+    """
+    if stream_callback:
+        await stream_callback("log", f"🔍 正在搜索: `{task}`")
+
+    search_tool = TavilySearch(max_results=settings.SEARCH_ANSWER_MAX_RESULTS)
+    try:
+        response = await search_tool.ainvoke({"query": task})
+    except Exception as e:
+        logger.warning(f"Search failed for '{task}': {e}")
+        return None
+
+    context = format_search_results(response)
+    if not context:
+        logger.info(f"Search returned no usable results for '{task}'.")
+        return None
+
+    llm = get_llm(
+        provider=settings.EXECUTOR_LLM_PROVIDER,
+        model_name=settings.EXECUTOR_LLM_MODEL,
+        temperature=settings.SEARCH_ANSWER_LLM_TEMPERATURE
+    )
+    chain = search_answer_prompt | llm | StrOutputParser()
+
+    if stream_callback:
+        await stream_callback("log", "正在根据搜索结果生成回答...")
+
+    # 开头可能是 NOT_GROUNDED 标记，确认不是标记之前先缓存，不推送给前端
+    timer = StreamTimer.for_llm(llm)
+    usage_handler = TokenUsageHandler()
+    answer = ""
+    grounded = False
+    streamed = False # 是否已经向前端推送过内容，与 grounded 分开记录，生成中途失败时也能据此清空
+    inputs = {"input": task, "context": context, "today": datetime.now().strftime("%Y-%m-%d")}
+    try:
+        async for chunk in chain.astream(inputs, config={"callbacks": [usage_handler]}):
+            if not chunk:
+                continue
+            timer.on_token()
+            answer += chunk
+
+            if not grounded:
+                head = answer.lstrip().lstrip("`")
+                if head.startswith(NOT_GROUNDED):
+                    break
+                if not head or NOT_GROUNDED.startswith(head):
+                    continue
+                grounded = True
+                chunk = answer
+
+            if stream_callback:
+                streamed = True
+                await stream_callback("chunk", chunk)
+    except Exception as e:
+        logger.warning(f"Search answer generation failed for '{task}': {e}")
+        grounded = False
+
+    stats = timer.finish(output_tokens=usage_handler.output_tokens)
+    if stats:
+        logger.info(
+            f"Search answer TTFT {stats['ttft']:.2f}s, "
+            f"{stats['output_tokens'] or '?'} tokens / {stats['chunks']} chunks in {stats['duration']:.2f}s"
+        )
+
+    # 模型也可能先写几句再给出标记，只要出现标记就视为没有依据
+    if not grounded or NOT_GROUNDED in answer:
+        logger.info(f"Search results were not sufficient to answer '{task}'.")
+        if streamed:
+            # 已经推送了部分内容，通知前端清空
+            await stream_callback("chunk_reset", "")
+        return None
+    return answer
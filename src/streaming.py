@@ -0,0 +1,83 @@
+import json
+import re
+
+# 结构化 Agent 的最终回答形如：{"action": "Final Answer", "action_input": "..."}
+_FINAL_ANSWER_PATTERN = re.compile(r'"action"\s*:\s*"Final Answer"')
+_ACTION_INPUT_PATTERN = re.compile(r'"action_input"\s*:\s*"')
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    '\\': '\\',
+    '/': '/',
+    'b': '\b',
+    'f': '\f',
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+}
+
+
+class FinalAnswerExtractor:
+    """
+    从执行器 LLM 的 token 流中增量提取 "Final Answer" 的 action_input 内容。
+    执行器输出的是 JSON 格式的动作块，直接转发 token 会把 JSON 语法也推给用户，
+    所以这里边解析边输出，只把最终回答的正文解码后返回。
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.position = None # action_input 字符串正文在 buffer 中的起始位置
+        self.finished = False
+
+    def feed(self, token: str) -> str:
+        """追加一个 token，返回本次新解码出的回答文本 (可能为空字符串)"""
+        if self.finished:
+            return ""
+        self.buffer += token
+
+        if self.position is None:
+            action_match = _FINAL_ANSWER_PATTERN.search(self.buffer)
+            if not action_match:
+                return ""
+            input_match = _ACTION_INPUT_PATTERN.search(self.buffer, action_match.end())
+            if not input_match:
+                return ""
+            self.position = input_match.end()
+
+        return self._decode()
+
+    def _decode(self) -> str:
+        output = []
+        i = self.position
+        while i < len(self.buffer):
+            char = self.buffer[i]
+            if char == '"':
+                self.finished = True
+                i += 1
+                break
+            if char != '\\':
+                output.append(char)
+                i += 1
+                continue
+            # 转义序列可能被拆在两个 token 之间，不完整时等待下一个 token
+            if i + 1 >= len(self.buffer):
+                break
+            escape = self.buffer[i + 1]
+            if escape == 'u':
+                if i + 6 > len(self.buffer):
+                    break
+                length = 6
+                # emoji 等字符在 JSON 中以两个 \u 转义组成的代理对表示，需要一起解码
+                if self.buffer[i + 2:i + 3].lower() == 'd' and self.buffer[i + 3:i + 4].lower() in '89ab':
+                    length = 12
+                    if i + length > len(self.buffer):
+                        break
+                try:
+                    output.append(json.loads(f'"{self.buffer[i:i + length]}"'))
+                except ValueError:
+                    output.append(self.buffer[i:i + length])
+                i += length
+            else:
+                output.append(_SIMPLE_ESCAPES.get(escape, escape))
+                i += 2
+        self.position = i
+        return "".join(output)
@@ -6,14 +6,16 @@ import logging.config
 from langchain_community.chat_models import ChatTongyi
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
-from e2b import AsyncSandbox
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
 from tenacity import retry, stop_after_attempt, wait_exponential
 from typing import Optional, Callable
 from config import settings
 from src.agent_creator import create_agent
+from src.tools.provisioning import ResourceProvisioner
 from src.router import router_chain 
 from src.llm_factory import get_llm
+from src.metrics import StreamTimer, TokenUsageHandler
+from src.search_answer import run_search_answer
 
 # 日志
 try:
@@ -63,7 +65,7 @@ async def run_agent_task(
             route = route.strip() # 去掉可能存在的多余空格或换行符
 
             # 是否有效
-            if route not in ["direct_answer", "plan_and_execute"]:
+            if route not in ["direct_answer", "search_answer", "plan_and_execute"]:
                 logger.warning(
                     f"Router chain returned an unexpected string: '{route}'. "
                     "Defaulting to 'plan_and_execute'."
@@ -96,39 +98,50 @@ async def run_agent_task(
             if stream_callback:
                 await stream_callback("log", "正在生成直接回答...")
             
-            # 使用流式调用 (astream)
+            # 使用流式调用 (astream)，每收到一个 chunk 就推送给前端
+            timer = StreamTimer.for_llm(direct_answer_llm)
+            usage_handler = TokenUsageHandler()
             final_answer = ""
-            async for chunk in direct_answer_chain.astream({"input": task}):
+            async for chunk in direct_answer_chain.astream({"input": task}, config={"callbacks": [usage_handler]}):
+                if not chunk:
+                    continue
+                timer.on_token()
                 final_answer += chunk
                 if stream_callback:
-                    # 为了简化，我们一次性发送最终结果，但也可以发送每个chunk
-                    # await stream_callback("chunk", chunk)
-                    pass
+                    await stream_callback("chunk", chunk)
             
             # 任务完成
+            stats = timer.finish(output_tokens=usage_handler.output_tokens)
+            if stats:
+                logger.info(
+                    f"Direct answer TTFT {stats['ttft']:.2f}s, "
+                    f"{stats['output_tokens'] or '?'} tokens / {stats['chunks']} chunks in {stats['duration']:.2f}s"
+                )
             logger.info(f"Direct answer for '{task}' finished successfully.")
             if stream_callback:
                 await stream_callback("result", final_answer)
             return {"status": "completed", "result": final_answer}
 
-        elif route == "plan_and_execute": # 需要规划的任务
-            playwright_cm = async_playwright()
-            p = None
-            sandbox_cm = None
-            sandbox = None
-            browser = None
-
-            try:
-                p = await playwright_cm.__aenter__()
-                sandbox_cm = await AsyncSandbox.create(api_key=settings.E2B_API_KEY)
-                sandbox = await sandbox_cm.__aenter__()
+        if route == "search_answer": # 一次搜索即可回答的任务
+            search_answer = await run_search_answer(task, stream_callback)
+            if search_answer is not None:
+                logger.info(f"Search answer for '{task}' finished successfully.")
+                if stream_callback:
+                    await stream_callback("result", search_answer)
+                return {"status": "completed", "result": search_answer}
 
-                if shutdown_event and shutdown_event.is_set():
-                    raise asyncio.CancelledError("Shutdown signal received before browser launch.")
+            # 搜索结果不足以回答，回退到完整的规划执行流程
+            logger.info(f"Search answer for '{task}' not grounded, falling back to 'plan_and_execute'.")
+            if stream_callback:
+                await stream_callback("log", "搜索结果不足以回答，转为规划执行模式...")
+            route = "plan_and_execute"
 
-                browser = await p.chromium.launch(headless=settings.BROWSER_HEADLESS)
+        if route == "plan_and_execute": # 需要规划的任务
+            # 浏览器和沙箱按需启动，只搜索的任务不会为它们付出启动成本
+            provisioner = ResourceProvisioner(stream_callback, shutdown_event)
 
-                agent = await create_agent(browser, sandbox, stream_callback)
+            try:
+                agent = await create_agent(provisioner, stream_callback)
 
                 if shutdown_event and shutdown_event.is_set():
                     raise asyncio.CancelledError("Shutdown signal received before agent execution.")
@@ -136,7 +149,8 @@ async def run_agent_task(
                 agent_task = asyncio.create_task(
                     agent.ainvoke(
                         {"input": task},
-                        config={"callbacks": agent.callbacks} if stream_callback else None
+                        # 同步模式下也传入回调，用于记录各模型的首 token 延迟
+                        config={"callbacks": agent.callbacks}
                     )
                 )
                 shutdown_task = asyncio.create_task(shutdown_event.wait()) if shutdown_event else None
@@ -173,12 +187,7 @@ async def run_agent_task(
                 return {"status": "cancelled", "message": str(e)}
             
             finally:
-                if browser and browser.is_connected():
-                    await browser.close()
-                if sandbox_cm:
-                    await sandbox_cm.__aexit__(None, None, None)
-                if playwright_cm:
-                    await playwright_cm.__aexit__(None, None, None)
+                await provisioner.aclose()
                 logger.info(f"Resources for task '{task}' have been cleaned up.")
     
     except Exception as e:
@@ -0,0 +1,119 @@
+import logging
+import re
+from typing import Any, Callable, Dict, List, Set, Tuple
+from langchain_core.callbacks import Callbacks
+from langchain_core.tools import BaseTool
+from langchain_experimental.plan_and_execute.executors.base import BaseExecutor
+from langchain_experimental.plan_and_execute.schema import StepResponse
+from pydantic import Field
+
+from src.cascade_executor import ToolRecorder, build_retry_inputs, with_callback_handler
+
+logger = logging.getLogger(__name__)
+
+# 步骤描述中出现这些关键词时，才把对应工具组放进执行器提示
+TOOL_GROUP_KEYWORDS: Dict[str, List[str]] = {
+    "browser": [
+        "网页", "网站", "网址", "页面", "浏览", "访问", "打开", "点击", "链接", "导航", "元素", "超链接",
+        "url", "http", "www", "browser", "navigate", "click", "page", "website",
+    ],
+    "sandbox": [
+        "代码", "运行", "脚本", "文件", "命令", "终端", "计算", "绘图", "画图", "图表", "分析", "统计", "表格",
+        "python", "shell", "bash", "pip", "csv", "excel", "script", "code",
+        "pandas", "numpy", "dataframe", "matplotlib", "plot", "load",
+    ],
+}
+
+# 关键词之外，用正则识别域名 (example.com) 和数据文件 (data.json)
+TOOL_GROUP_PATTERNS: Dict[str, re.Pattern] = {
+    "browser": re.compile(r"[a-z0-9-]+\.(com|cn|net|org|io|gov|edu|info|co|ai|dev)\b"),
+    "sandbox": re.compile(r"[\w-]+\.(json|csv|tsv|xlsx?|parquet|txt|py|ipynb|sql|db|sqlite|pdf|docx?|png|jpe?g)\b"),
+}
+
+# AgentExecutor 遇到不存在的工具名时调用的占位工具
+INVALID_TOOL_NAME = "invalid_tool"
+
+
+def select_tool_groups(step_text: str) -> Set[str]:
+    """根据步骤描述判断需要哪些工具组"""
+    text = step_text.lower()
+    groups = {
+        group for group, keywords in TOOL_GROUP_KEYWORDS.items()
+        if any(keyword in text for keyword in keywords)
+    }
+    groups |= {group for group, pattern in TOOL_GROUP_PATTERNS.items() if pattern.search(text)}
+    return groups
+
+
+class ToolSelectingExecutor(BaseExecutor):
+    """
+    按计划步骤挑选工具的执行器。
+    base_tools (日期、搜索等) 始终可用；浏览器、沙箱等工具组只在步骤需要时才放进执行器提示，
+    减少提示 token。某个工具组一旦被选中，后续步骤会继续保留 (例如打开网页后的提取文本步骤)；
+    模型调用了不在提示里的工具 (invalid_tool) 时，说明选出的工具不够用，当前步骤会带上全部工具重新执行；
+    其他异常与工具组无关，直接向上抛出。重新执行时沿用 CascadeExecutor 升级的规则 (见 build_retry_inputs)：
+    第一次尝试调用过有状态工具时，已执行的调用会作为上下文传入，不会被重复执行。
+    """
+    base_tools: List[BaseTool]
+    tool_groups: Dict[str, List[BaseTool]]
+    executor_factory: Callable[[List[BaseTool]], BaseExecutor]
+    active_groups: Set[str] = Field(default_factory=set)
+    executors: Dict[Tuple[str, ...], BaseExecutor] = Field(default_factory=dict)
+
+    def _select_groups(self, inputs: dict) -> Tuple[str, ...]:
+        current_step = inputs.get("current_step")
+        step_text = getattr(current_step, "value", str(current_step))
+        self.active_groups |= select_tool_groups(step_text) & self.tool_groups.keys()
+        return tuple(sorted(self.active_groups))
+
+    def _get_executor(self, key: Tuple[str, ...]) -> BaseExecutor:
+        if key not in self.executors:
+            tools = list(self.base_tools)
+            for group in key:
+                tools.extend(self.tool_groups[group])
+            logger.info(f"Building executor with tool groups: {list(key) or ['base']}")
+            self.executors[key] = self.executor_factory(tools)
+        return self.executors[key]
+
+    def _needs_all_tools(self, recorder: ToolRecorder) -> bool:
+        """
+        模型调用了不在提示里的工具时，后续步骤改用全部工具组，并返回 True 让当前步骤重新执行。
+        工具本身是延迟启动的，多放几个工具只多花提示 token。
+        """
+        if INVALID_TOOL_NAME not in recorder.tools:
+            return False
+        logger.warning("Step called a tool outside the reduced tool set, retrying with all tool groups.")
+        self.active_groups = set(self.tool_groups)
+        return True
+
+    def step(self, inputs: dict, callbacks: Callbacks = None, **kwargs: Any) -> StepResponse:
+        key = self._select_groups(inputs)
+        all_groups = tuple(sorted(self.tool_groups))
+        if key == all_groups:
+            return self._get_executor(key).step(inputs, callbacks=callbacks, **kwargs)
+
+        recorder = ToolRecorder()
+        response = self._get_executor(key).step(
+            inputs, callbacks=with_callback_handler(callbacks, recorder), **kwargs
+        )
+        if not self._needs_all_tools(recorder):
+            return response
+        return self._get_executor(all_groups).step(
+            build_retry_inputs(inputs, recorder), callbacks=callbacks, **kwargs
+        )
+
+    async def astep(self, inputs: dict, callbacks: Callbacks = None, **kwargs: Any) -> StepResponse:
+        key = self._select_groups(inputs)
+        all_groups = tuple(sorted(self.tool_groups))
+        if key == all_groups:
+            return await self._get_executor(key).astep(inputs, callbacks=callbacks, **kwargs)
+
+        recorder = ToolRecorder()
+        response = await self._get_executor(key).astep(
+            inputs, callbacks=with_callback_handler(callbacks, recorder), **kwargs
+        )
+        if not self._needs_all_tools(recorder):
+            return response
+        return await self._get_executor(all_groups).astep(
+            build_retry_inputs(inputs, recorder), callbacks=callbacks, **kwargs
+        )
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import logging
+import shutil
+import sys
+import tempfile
+from typing import Awaitable, Callable, Optional
+from langchain_core.tools import StructuredTool
+from e2b import TimeoutException
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 本地替身后端的驱动脚本：在同一个命名空间里反复 exec 代码，变量和导入在多次调用之间保留。
+# 协议为每行一个 JSON，请求 {"code", "max_chars"}，响应 {"stdout", "stderr", "result", "error"}。
+_LOCAL_KERNEL_DRIVER = r'''
+import ast, contextlib, io, json, os, sys, traceback
+
+def truncate(text, limit):
+    if text and len(text) > limit:
+        return text[:limit] + f"\n...[输出已截断，共 {len(text)} 字符]"
+    return text
+
+# 协议使用复制出来的文件描述符；exit() 会关闭 sys.stdin，直接写 fd 1 的输出也不能混进协议
+requests = os.fdopen(os.dup(0), "r", encoding="utf-8")
+protocol = os.fdopen(os.dup(1), "w", encoding="utf-8")
+devnull = os.open(os.devnull, os.O_RDWR)
+os.dup2(devnull, 0)
+os.dup2(devnull, 1)
+
+namespace = {"__name__": "__main__"}
+for line in requests:
+    request = json.loads(line)
+    stdout, stderr = io.StringIO(), io.StringIO()
+    result, error = None, None
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            tree = ast.parse(request["code"], mode="exec")
+            # 与 Jupyter 一样，最后一个表达式的值作为结果返回
+            last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+            exec(compile(tree, "<kernel>", "exec"), namespace)
+            if last is not None:
+                value = eval(compile(ast.Expression(last.value), "<kernel>", "eval"), namespace)
+                if value is not None:
+                    result = repr(value)
+    except BaseException as e:
+        # 只保留用户代码的调用栈，去掉驱动脚本自身的帧
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != "<kernel>":
+            tb = tb.tb_next
+        error = "".join(traceback.format_exception(type(e), e, tb))
+    limit = request["max_chars"]
+    response = {
+        "stdout": truncate(stdout.getvalue(), limit),
+        "stderr": truncate(stderr.getvalue(), limit),
+        "result": truncate(result, limit),
+        "error": truncate(error, limit),
+    }
+    protocol.write(json.dumps(response) + "\n")
+    protocol.flush()
+'''
+
+
+def truncate_output(text: Optional[str], max_chars: int) -> Optional[str]:
+    if text and len(text) > max_chars:
+        return text[:max_chars] + f"\n...[输出已截断，共 {len(text)} 字符]"
+    return text
+
+
+def format_kernel_output(output: dict) -> str:
+    """把内核返回的各部分输出拼成给 Agent 的文本 (各后端已按上限截断)"""
+    sections = []
+    for key, title in [("stdout", "STDOUT"), ("stderr", "STDERR"), ("result", "RESULT"), ("error", "ERROR")]:
+        text = output.get(key)
+        if text:
+            sections.append(f"{title}:\n{text}")
+    return "\n".join(sections) or "代码执行成功，没有输出。"
+
+
+class LocalKernel:
+    """
+    本地替身后端：在子进程中运行一个常驻的 Python 解释器。
+    没有任何隔离，仅用于开发调试或没有 E2B 的环境。
+    """
+    def __init__(self, max_output_chars: int):
+        self.max_output_chars = max_output_chars
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._workdir: Optional[str] = None
+        self._lock = asyncio.Lock()
+
+    async def _ensure_started(self):
+        if self._process is None or self._process.returncode is not None:
+            if self._workdir is None:
+                self._workdir = tempfile.mkdtemp(prefix="zenith-kernel-")
+            self._process = await asyncio.create_subprocess_exec(
+                sys.executable, "-u", "-c", _LOCAL_KERNEL_DRIVER,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                cwd=self._workdir,
+                limit=2 ** 20, # 响应是单行 JSON，默认的 64KB 行长度上限不够用
+            )
+
+    async def _kill(self):
+        if self._process and self._process.returncode is None:
+            self._process.kill()
+            await self._process.wait()
+        self._process = None
+
+    async def execute(self, code: str, timeout: float) -> dict:
+        async with self._lock:
+            await self._ensure_started()
+            request = json.dumps({"code": code, "max_chars": self.max_output_chars}) + "\n"
+            self._process.stdin.write(request.encode("utf-8"))
+            await self._process.stdin.drain()
+            try:
+                line = await asyncio.wait_for(self._process.stdout.readline(), timeout)
+            except asyncio.TimeoutError:
+                await self._kill()
+                return {"error": f"执行超时 ({timeout}s)，内核已重启，之前定义的变量和加载的数据已丢失。"}
+            if not line:
+                await self._kill()
+                return {"error": "内核进程意外退出，已重启，之前定义的变量和加载的数据已丢失。"}
+            return json.loads(line)
+
+    async def reset(self):
+        """丢弃解释器状态，下次执行时启动新的进程；工作目录中的文件保留"""
+        async with self._lock:
+            await self._kill()
+
+    async def aclose(self):
+        await self.reset()
+        if self._workdir:
+            shutil.rmtree(self._workdir, ignore_errors=True)
+            self._workdir = None
+
+
+class E2BKernel:
+    """
+    E2B 沙箱中的有状态代码执行，使用 e2b-code-interpreter 提供的 Jupyter 内核上下文。
+    sandbox_provider 返回的沙箱需要是 e2b_code_interpreter.AsyncSandbox。
+    """
+    def __init__(self, sandbox_provider: Callable[[], Awaitable], max_output_chars: int):
+        self.get_sandbox = sandbox_provider
+        self.max_output_chars = max_output_chars
+        self._context = None
+        self._lock = asyncio.Lock()
+
+    async def execute(self, code: str, timeout: float) -> dict:
+        async with self._lock:
+            sandbox = await self.get_sandbox()
+            if not hasattr(sandbox, "run_code"):
+                return {"error": "当前沙箱不支持有状态代码执行，请安装 e2b-code-interpreter，或设置 CODE_KERNEL_BACKEND=local。"}
+            if self._context is None:
+                self._context = await sandbox.create_code_context(language="python")
+            try:
+                execution = await sandbox.run_code(code, context=self._context, timeout=timeout)
+            except TimeoutException:
+                # 客户端超时后远端的代码仍在运行，后续调用会排在它后面，必须删除整个上下文
+                await self._discard_context(sandbox)
+                return {"error": f"执行超时 ({timeout}s)，内核已重启，之前定义的变量和加载的数据已丢失。"}
+            except Exception as e:
+                return {"error": f"执行失败: {e}"}
+
+            error = None
+            if execution.error:
+                error = f"{execution.error.name}: {execution.error.value}\n{execution.error.traceback}"
+            output = {
+                "stdout": "".join(execution.logs.stdout),
+                "stderr": "".join(execution.logs.stderr),
+                "result": "\n".join(r.text for r in execution.results if r.text),
+                "error": error,
+            }
+            return {key: truncate_output(text, self.max_output_chars) for key, text in output.items()}
+
+    async def _discard_context(self, sandbox):
+        """删除远端的内核上下文 (其中正在运行的代码和已加载的数据一并释放)，下次执行时创建新的上下文"""
+        context, self._context = self._context, None
+        if context is None:
+            return
+        try:
+            await sandbox.remove_code_context(context)
+        except Exception as e:
+            logger.warning(f"Failed to remove code context: {e}")
+
+    async def reset(self):
+        """删除远端的内核上下文，丢弃全部变量和已加载的数据"""
+        async with self._lock:
+            if self._context is not None:
+                await self._discard_context(await self.get_sandbox())
+
+    async def aclose(self):
+        await self.reset()
+
+
+class KernelToolManager:
+    """
+    有状态代码执行工具。
+    kernel_provider 是一个返回内核实例的异步函数，内核在第一次调用工具时才会被创建。
+    """
+    def __init__(self, kernel_provider: Callable[[], Awaitable]):
+        self.get_kernel = kernel_provider
+
+    async def run_python_code(self, code: str) -> str:
+        """Executes Python code in a persistent interpreter session, like a Jupyter notebook cell.
+        Variables, imports and loaded data are kept between calls, so load data once and reuse it in later steps
+        instead of re-running scripts. The value of the last expression is returned."""
+        kernel = await self.get_kernel()
+        output = await kernel.execute(code, timeout=settings.CODE_KERNEL_TIMEOUT)
+        return format_kernel_output(output)
+
+
+    async def reset_python_kernel(self) -> str:
+        """Resets the persistent Python session, discarding all variables, imports and loaded data."""
+        kernel = await self.get_kernel()
+        await kernel.reset()
+        return "Python session has been reset."
+
+
+    def get_all_tools(self):
+        return [
+            StructuredTool.from_function(coroutine=self.run_python_code),
+            StructuredTool.from_function(coroutine=self.reset_python_kernel),
+        ]
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun
+from langchain_core.tools import BaseTool
+from langchain_community.tools.playwright import (
+    ClickTool,
+    CurrentWebPageTool,
+    ExtractHyperlinksTool,
+    ExtractTextTool,
+    GetElementsTool,
+    NavigateBackTool,
+    NavigateTool,
+)
+from playwright.async_api import async_playwright
+from pydantic import PrivateAttr
+from e2b import AsyncSandbox
+
+from config import settings
+from src.tools.kernel import E2BKernel, LocalKernel
+
+try:
+    # 可选依赖：提供带 Jupyter 内核的沙箱，用于有状态代码执行
+    from e2b_code_interpreter import AsyncSandbox as CodeInterpreterSandbox
+except ImportError:
+    CodeInterpreterSandbox = None
+
+logger = logging.getLogger(__name__)
+
+# 与 PlayWrightBrowserToolkit.get_tools() 返回的工具一致
+BROWSER_TOOL_CLASSES = [
+    ClickTool,
+    NavigateTool,
+    NavigateBackTool,
+    ExtractTextTool,
+    ExtractHyperlinksTool,
+    GetElementsTool,
+    CurrentWebPageTool,
+]
+
+
+class ResourceProvisioner:
+    """
+    按需启动浏览器和 E2B 沙箱。
+    资源在第一次被工具使用时才创建，同一个任务内复用；任务结束时调用 aclose() 统一清理。
+    """
+    def __init__(self, stream_callback: Optional[Callable] = None, shutdown_event: Optional[asyncio.Event] = None):
+        self.stream_callback = stream_callback
+        self.shutdown_event = shutdown_event
+        self._browser_lock = asyncio.Lock()
+        self._sandbox_lock = asyncio.Lock()
+        self._kernel_lock = asyncio.Lock()
+        self._playwright_cm = None
+        self._browser = None
+        self._sandbox_cm = None
+        self._sandbox = None
+        self._kernel = None
+
+    async def _log(self, message: str):
+        logger.info(message)
+        if self.stream_callback:
+            await self.stream_callback("log", message)
+
+    async def get_browser(self):
+        async with self._browser_lock:
+            if self._browser is None:
+                if self.shutdown_event and self.shutdown_event.is_set():
+                    raise asyncio.CancelledError("Shutdown signal received before browser launch.")
+                await self._log("🌐 首次使用浏览器工具，正在启动浏览器...")
+                self._playwright_cm = async_playwright()
+                p = await self._playwright_cm.__aenter__()
+                self._browser = await p.chromium.launch(headless=settings.BROWSER_HEADLESS)
+            return self._browser
+
+    async def get_sandbox(self) -> AsyncSandbox:
+        async with self._sandbox_lock:
+            if self._sandbox is None:
+                if self.shutdown_event and self.shutdown_event.is_set():
+                    raise asyncio.CancelledError("Shutdown signal received before sandbox creation.")
+                await self._log("📦 首次使用沙箱工具，正在创建沙箱...")
+                # code interpreter 沙箱是 AsyncSandbox 的子类，shell/文件工具 (commands/files API) 与内核共用同一个实例，
+                # run_python_code 写出的文件可以直接用 read_file_in_sandbox 读取
+                sandbox_cls = AsyncSandbox
+                if settings.CODE_KERNEL_BACKEND == "e2b" and CodeInterpreterSandbox is not None:
+                    sandbox_cls = CodeInterpreterSandbox
+                self._sandbox_cm = await sandbox_cls.create(api_key=settings.E2B_API_KEY)
+                self._sandbox = await self._sandbox_cm.__aenter__()
+            return self._sandbox
+
+    async def get_kernel(self):
+        """返回本任务的有状态代码内核，变量和已加载的数据在多个执行步骤之间保留"""
+        async with self._kernel_lock:
+            if self._kernel is None:
+                if settings.CODE_KERNEL_BACKEND == "local":
+                    self._kernel = LocalKernel(settings.CODE_KERNEL_MAX_OUTPUT_CHARS)
+                else:
+                    self._kernel = E2BKernel(self.get_sandbox, settings.CODE_KERNEL_MAX_OUTPUT_CHARS)
+            return self._kernel
+
+    async def aclose(self):
+        """清理已经启动的资源，未启动的资源直接跳过"""
+        if self._kernel:
+            await self._kernel.aclose()
+        if self._browser and self._browser.is_connected():
+            await self._browser.close()
+        if self._playwright_cm:
+            await self._playwright_cm.__aexit__(None, None, None)
+        if self._sandbox_cm:
+            await self._sandbox_cm.__aexit__(None, None, None)
+        self._browser = self._playwright_cm = None
+        self._sandbox = self._sandbox_cm = None
+        self._kernel = None
+
+
+class LazyTool(BaseTool):
+    """
+    工具的延迟代理：名称、描述和参数定义与真实工具一致，
+    第一次被调用时才通过 factory 创建真实工具 (从而触发浏览器等资源的启动)。
+    """
+    factory: Callable[[], Awaitable[BaseTool]]
+    _tool: Optional[BaseTool] = PrivateAttr(default=None)
+    _lock: asyncio.Lock = PrivateAttr(default_factory=asyncio.Lock)
+
+    @classmethod
+    def from_template(cls, template: BaseTool, factory: Callable[[], Awaitable[BaseTool]]) -> "LazyTool":
+        return cls(
+            name=template.name,
+            description=template.description,
+            args_schema=template.args_schema,
+            factory=factory,
+        )
+
+    async def _get_tool(self) -> BaseTool:
+        async with self._lock:
+            if self._tool is None:
+                self._tool = await self.factory()
+            return self._tool
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        raise NotImplementedError(f"{self.name} 只支持异步调用")
+
+    async def _arun(
+        self, *args: Any, run_manager: Optional[AsyncCallbackManagerForToolRun] = None, **kwargs: Any
+    ) -> Any:
+        tool = await self._get_tool()
+        tool_input = args[0] if args and not kwargs else kwargs
+        # 代理本身已经触发过工具回调，这里不再向下传递，避免同一次调用被记录两次
+        return await tool.arun(tool_input)
+
+
+def get_lazy_browser_tools(provisioner: ResourceProvisioner) -> List[BaseTool]:
+    """返回浏览器工具的延迟代理，只有 Agent 真正调用时才会启动浏览器"""
+    def make_factory(tool_cls):
+        async def factory() -> BaseTool:
+            return tool_cls.from_browser(async_browser=await provisioner.get_browser())
+        return factory
+
+    # model_construct 跳过校验 (校验要求必须传入浏览器实例)，只用来读取名称、描述和参数定义
+    return [
+        LazyTool.from_template(tool_cls.model_construct(), make_factory(tool_cls))
+        for tool_cls in BROWSER_TOOL_CLASSES
+    ]
@@ -1,41 +1,47 @@
-from langchain.tools import tool
-from e2b import AsyncSandbox
+from typing import Awaitable, Callable
+from langchain_core.tools import StructuredTool
+from e2b import AsyncSandbox, CommandExitException
 
-# --- 1. 沙箱工具管理器 (保持不变，这是我们的核心模块) ---
+# --- 1. 沙箱工具管理器 (核心模块) ---
 class SandboxToolManager:
-    def __init__(self, sandbox_instance: AsyncSandbox):
-        self.sandbox = sandbox_instance
+    """
+    沙箱工具管理器。
+    sandbox_provider 是一个返回沙箱实例的异步函数，沙箱在第一次调用工具时才会被创建。
+    """
+    def __init__(self, sandbox_provider: Callable[[], Awaitable[AsyncSandbox]]):
+        self.get_sandbox = sandbox_provider
 
-    @tool
     async def run_shell_command(self, command: str) -> str:
         """Executes a shell command in a secure sandboxed environment..."""
-        # ... (省略具体实现, 和上一条回复一样) ...
+        sandbox = await self.get_sandbox()
         print(f"--- Sandbox: Executing shell command: {command} ---")
-        process = await self.sandbox.process.start(command)
-        await process.wait()
-        return f"STDOUT:\n{process.output.stdout}\nSTDERR:\n{process.output.stderr}"
+        try:
+            result = await sandbox.commands.run(command)
+        except CommandExitException as e:
+            # 非零退出码会抛出异常，输出仍然交给 Agent 判断
+            result = e
+        return f"EXIT CODE: {result.exit_code}\nSTDOUT:\n{result.stdout}\nSTDERR:\n{result.stderr}"
 
 
-    @tool
     async def write_file_in_sandbox(self, filepath: str, content: str) -> str:
         """Writes content to a file inside the sandboxed environment..."""
-        # ... (省略具体实现) ...
+        sandbox = await self.get_sandbox()
         print(f"--- Sandbox: Writing to file: {filepath} ---")
-        await self.sandbox.filesystem.write(filepath, content)
+        await sandbox.files.write(filepath, content)
         return f"Successfully wrote to {filepath}."
 
 
-    @tool
     async def read_file_in_sandbox(self, filepath: str) -> str:
         """Reads the content of a file from the sandboxed environment..."""
-        # ... (省略具体实现) ...
+        sandbox = await self.get_sandbox()
         print(f"--- Sandbox: Reading from file: {filepath} ---")
-        return await self.sandbox.filesystem.read(filepath)
+        return await sandbox.files.read(filepath)
 
 
     def get_all_tools(self):
+        # 用绑定方法创建工具，参数定义里不会出现 self
         return [
-            self.run_shell_command,
-            self.write_file_in_sandbox,
-            self.read_file_in_sandbox,
-        ]
\ No newline at end of file
+            StructuredTool.from_function(coroutine=self.run_shell_command),
+            StructuredTool.from_function(coroutine=self.write_file_in_sandbox),
+            StructuredTool.from_function(coroutine=self.read_file_in_sandbox),
+        ]
@@ -61,8 +61,17 @@ if st.button("🚀 执行任务", disabled=not task_input):
                         print("plan", plan)
                         plan += f"{data}\n"
                         plan_placeholder.text_area("执行计划", value=plan)
+                    elif event_type == "chunk":
+                        # 逐 token 流式输出的最终回答
+                        result_data += data
+                        result_placeholder.text_area("结果", value=result_data)
+                    elif event_type == "chunk_reset":
+                        # 该步骤被重新执行，之前流式输出的回答已作废
+                        result_data = ""
+                        result_placeholder.text_area("结果", value=result_data)
                     elif event_type == "result":
-                        result_data += f"{data}\n"
+                        # 完整结果以服务端为准，覆盖流式拼接的内容
+                        result_data = f"{data}\n"
                         print("result", result_data)
                         result_placeholder.text_area("结果", value=result_data)
                     # elif event_type == "error":